@@ -1,8 +1,19 @@
 import streamlit as st
 import pandas as pd
 from db.database import SessionLocal
-from db.models import Booking, Customer
+from db.models import Booking
 from app.tools import cancel_booking_tool
+from app.booking_stats import invalidate_booking_caches
+
+def _cancel_booking():
+    booking_id = st.session_state.get("cancel_booking_id")
+    if booking_id:
+        res = cancel_booking_tool(booking_id)
+        # Booking stats elsewhere in the app are cached; drop only those
+        invalidate_booking_caches()
+        st.session_state.cancel_result = ("success", res)
+    else:
+        st.session_state.cancel_result = ("warning", "Please enter a Booking ID")
 
 def admin_page():
     st.title("Admin Dashboard")
@@ -14,8 +25,8 @@ def admin_page():
     for b in bookings:
         data.append({
             "ID": b.id,
-            "Customer": b.customer.name,
-            "Email": b.customer.email,
+            "Customer": b.customer_name,
+            "Email": b.customer_email,
             "Type": b.booking_type,
             "Date": b.date,
             "Time": b.time,
@@ -38,13 +49,12 @@ def admin_page():
     
     col1, col2 = st.columns([2, 1])
     with col1:
-        booking_id = st.text_input("Enter Booking ID to Cancel")
+        st.text_input("Enter Booking ID to Cancel", key="cancel_booking_id")
     with col2:
         st.markdown("<br>", unsafe_allow_html=True)
-        if st.button("Cancel Booking", type="primary", use_container_width=True):
-            if booking_id:
-                res = cancel_booking_tool(booking_id)
-                st.success(res)
-                st.rerun()
-            else:
-                st.warning("Please enter a Booking ID")
+        # Runs before the next rerun, so the table above already shows the new status
+        st.button("Cancel Booking", type="primary", use_container_width=True, on_click=_cancel_booking)
+    
+    if "cancel_result" in st.session_state:
+        level, message = st.session_state.pop("cancel_result")
+        getattr(st, level)(message)
@@ -16,10 +16,10 @@ class BookingFlow:
     def __init__(self, llm):
         self.llm = llm
         self.parser = JsonOutputParser(pydantic_object=BookingState)
+        self._format_instructions = self.parser.get_format_instructions()
         
-    def extract_intent_and_slots(self, history, current_input):
-        """Extracts booking details from conversation."""
-        prompt = PromptTemplate(
+        # Build the prompt and LCEL chain once; they are reused on every turn
+        self.prompt = PromptTemplate(
             template="""
             You are an AI Booking Assistant. Analyze the conversation and extract booking details for the CURRENT booking request.
             
@@ -40,15 +40,35 @@ class BookingFlow:
             {format_instructions}
             """,
             input_variables=["history", "input"],
-            partial_variables={"format_instructions": self.parser.get_format_instructions()}
+            partial_variables={"format_instructions": self._format_instructions}
         )
+        self.chain = self.prompt | self.llm | self.parser if self.llm else None
         
-        chain = prompt | self.llm | self.parser
+    def extract_intent_and_slots(self, history, current_input):
+        """Extracts booking details from conversation."""
+        if self.chain is None:
+            return {}
         try:
-            return chain.invoke({"history": history, "input": current_input})
+            return self.chain.invoke({"history": history, "input": current_input})
         except Exception:
             return {}
 
+    def summarize_history(self, messages, previous_summary=""):
+        """Condenses older conversation turns into a short booking-focused summary."""
+        if self.llm is None or not messages:
+            return previous_summary
+        transcript = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in messages)
+        try:
+            response = self.llm.invoke(
+                "Summarize the following conversation in at most 5 sentences, keeping every "
+                "booking detail (name, email, phone, service, date, time, confirmations).\n\n"
+                f"Existing summary: {previous_summary or 'None'}\n\n"
+                f"New messages:\n{transcript}"
+            )
+            return response.content
+        except Exception:
+            return previous_summary
+
     def get_next_step(self, current_slots):
         """Determines the next question to ask based on missing slots."""
         required_slots = ["name", "email", "phone", "booking_type", "date", "time"]
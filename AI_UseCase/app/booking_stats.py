@@ -0,0 +1,62 @@
+"""
+Cached booking aggregates shared by the chat app and the admin dashboard.
+Kept out of main.py (which runs as __main__) so other pages can import and
+clear exactly these caches.
+"""
+
+import streamlit as st
+import pandas as pd
+from sqlalchemy import select, func
+from db.database import engine, SessionLocal
+from db.models import Booking, Customer
+
+@st.cache_data(ttl=30)
+def sidebar_stats():
+    """Booking/customer counts for the sidebar, cached across reruns."""
+    db = SessionLocal()
+    try:
+        return {
+            "total": db.query(Booking).count(),
+            "confirmed": db.query(Booking).filter(Booking.status == "confirmed").count(),
+            "cancelled": db.query(Booking).filter(Booking.status == "cancelled").count(),
+            "customers": db.query(Customer).count()
+        }
+    finally:
+        db.close()
+
+def bookings_checksum():
+    """Cheap fingerprint of the bookings table used as a cache key."""
+    db = SessionLocal()
+    try:
+        # Plain tuple: st.cache_data cannot hash a SQLAlchemy Row
+        count, latest = db.query(func.count(Booking.id), func.max(Booking.created_at)).one()
+        return (count, latest)
+    finally:
+        db.close()
+
+def count_by(column, label, limit=None):
+    """Reads `column` value counts (most frequent first) as a DataFrame."""
+    stmt = select(column.label(label), func.count().label("count"))\
+        .group_by(column)\
+        .order_by(func.count().desc())\
+        .limit(limit)
+    return pd.read_sql(stmt, engine)
+
+@st.cache_data(ttl=60)
+def insights_data(checksum):
+    """Aggregates for the insights charts; `checksum` only serves as the cache key."""
+    created_date = func.date(Booking.created_at)
+    timeline = select(created_date.label("created_date"), func.count().label("count"))\
+        .group_by(created_date)\
+        .order_by(created_date)
+    return {
+        "status": count_by(Booking.status, "status"),
+        "type": count_by(Booking.booking_type, "type"),
+        "timeline": pd.read_sql(timeline, engine),
+        "time": count_by(Booking.time, "time", limit=10)
+    }
+
+def invalidate_booking_caches():
+    """Drops the booking aggregates after a booking is created or cancelled."""
+    sidebar_stats.clear()
+    insights_data.clear()
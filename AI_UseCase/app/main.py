@@ -4,6 +4,9 @@ import sys
 from dotenv import load_dotenv
 from datetime import datetime
 import io
+import queue
+import re
+import time
 import uuid
 
 # Add project root to path
@@ -14,36 +17,156 @@ load_dotenv()
 
 # Initialize database
 from db.database import Base, engine, SessionLocal
-from db.models import Booking, Customer, ConversationHistory
+from db.models import Booking, ConversationHistory
+from db import migrations
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+@st.cache_resource
+def _init_db():
+    """Creates tables and applies column upgrades once per process."""
+    Base.metadata.create_all(bind=engine)
+    migrations.upgrade(engine)
+    return True
+
+_init_db()
 
 # Imports
 from app.rag_pipeline import rag_pipeline
 from app.booking_flow import BookingFlow
-from app.tools import save_booking_tool, send_email_tool, check_availability, cancel_booking_tool
+from app.tools import save_booking_tool, send_email_in_background, check_availability, cancel_booking_tool, background_executor
 from app.admin_dashboard import admin_page
 from app.memory_manager import memory_manager
+from app.booking_stats import sidebar_stats, bookings_checksum, insights_data, invalidate_booking_caches
 from langchain_groq import ChatGroq
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func, case, distinct, or_
 import pandas as pd
 import networkx as nx
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
 
-# Initialize LLM
+@st.cache_resource
+def get_llm():
+    """Groq client shared by every session and rerun of this process."""
+    return ChatGroq(model="llama-3.3-70b-versatile")
+
+@st.cache_resource
+def get_booking_flow():
+    return BookingFlow(get_llm())
+
+# Initialize LLM (failures are not cached, so a fixed key is picked up on the next rerun)
 try:
-    llm = ChatGroq(model="llama-3.3-70b-versatile")
+    llm = get_llm()
+    booking_flow = get_booking_flow()
 except Exception as e:
     st.error(f"Failed to initialize Groq LLM: {str(e)}. Please set GROQ_API_KEY in .env")
     llm = None
+    booking_flow = BookingFlow(llm)
+
+QUICK_ACTIONS = [
+    ("📅 Book Appointment", "I want to book an appointment"),
+    ("❓ Ask About Services", "What services do you offer?"),
+    ("🔍 Check Availability", "What time slots are available?")
+]
+
+# Emails, digits (dates, times, phone numbers) and relative day words worth sending to the slot extractor
+STRUCTURED_INPUT = re.compile(
+    r"[\w.+-]+@[\w-]+\.[\w.]+|\d|\b(?:today|tomorrow|tonight|mon|tues|wednes|thurs|fri|satur|sun)(?:day)?\b",
+    re.IGNORECASE
+)
+
+def _mentions_booking(text):
+    return "book" in text.lower()
+
+# An actual request to make a booking ("I want to book", "book a room"), not just a mention
+BOOKING_REQUEST = re.compile(
+    r"\b(?:(?:want|like|need|wish) to|can i|could i|please|let me)\s+book\b"
+    r"|\bbook\s+(?:an?\s+|the\s+|my\s+)?(?:\w+\s+)?(?:appointment|consultation|session|meeting|room|slot|visit)\b",
+    re.IGNORECASE
+)
+
+# Quick actions that are routed to RAG rather than the booking flow
+QUICK_RAG_PROMPTS = [text for _, text in QUICK_ACTIONS if not _mentions_booking(text)]
+
+@st.cache_resource
+def _prewarm_quick_actions():
+    """Answers the fixed quick-action questions once per process, in the background."""
+    return background_executor.submit(rag_pipeline.prewarm, QUICK_RAG_PROMPTS, get_llm())
+
+# Number of most recent messages sent verbatim to the LLM
+HISTORY_WINDOW = 8
+
+def _windowed_history():
+    """Last HISTORY_WINDOW messages, prefixed by a summary of older turns when available.
+
+    The summary is refreshed on the background pool, so a turn never waits for it;
+    until a refresh finishes the previous summary is used.
+    """
+    messages = st.session_state.messages
+    if len(messages) <= HISTORY_WINDOW:
+        return messages
+    
+    older = messages[:-HISTORY_WINDOW]
+    job = st.session_state.get("history_summary_job")
+    if job and job[1].done():
+        st.session_state.history_summary = job[1].result()
+        st.session_state.history_summary_covers = job[0]
+        st.session_state.history_summary_job = job = None
+    
+    summary = st.session_state.get("history_summary", "")
+    covered = st.session_state.get("history_summary_covers", 0)
+    if job is None and covered < len(older):
+        st.session_state.history_summary_job = (
+            len(older),
+            background_executor.submit(booking_flow.summarize_history, older[covered:], summary)
+        )
+    
+    recent = messages[-HISTORY_WINDOW:]
+    if summary:
+        return [{"role": "system", "content": f"Summary of earlier conversation: {summary}"}] + recent
+    return recent
+
+def _reset_history_summary():
+    for key in ("history_summary", "history_summary_covers", "history_summary_job"):
+        st.session_state.pop(key, None)
+
+@st.cache_resource
+def _get_writer():
+    """Single worker so chat messages are persisted in submission order."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-writer")
 
-booking_flow = BookingFlow(llm)
+def _persist_message(session_id, role, content):
+    """Saves a chat message off the request path."""
+    future = _get_writer().submit(memory_manager.add_message, session_id, role, content)
+    pending = [f for f in st.session_state.get("pending_writes", []) if not f.done()]
+    st.session_state.pending_writes = pending + [future]
+
+@st.cache_resource
+def _get_ingest_executor():
+    """Dedicated worker for PDF ingestion, so long uploads never delay booking I/O.
+    A single worker also keeps two ingests from mutating FAISS and the KG at once."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-ingest")
+
+def _start_pdf_job(uploaded_file):
+    """Queues process_pdf for an upload; returns (file_id, future, progress queue)."""
+    updates = queue.SimpleQueue()
+    future = _get_ingest_executor().submit(rag_pipeline.process_pdf, uploaded_file, updates.put)
+    return uploaded_file.file_id, future, updates
+
+def _wait_for_pdf_job(job, status):
+    """Waits for an ingest job, relaying its progress into `status`."""
+    _, future, updates = job
+    while True:
+        done = future.done()
+        while not updates.empty():
+            status.write(updates.get())
+        if done:
+            return future.result()
+        time.sleep(0.1)
 
 def main():
     st.set_page_config(page_title="NeoBook AI", layout="wide", page_icon="🤖")
     
+    if llm:
+        _prewarm_quick_actions()
+    
     # Sidebar
     with st.sidebar:
         st.title("🤖 NeoBook AI")
@@ -52,29 +175,34 @@ def main():
         # PDF Upload
         st.header("📚 Knowledge Base")
         uploaded_file = st.file_uploader("Upload PDF", type="pdf")
-        if uploaded_file:
-            with st.spinner("Processing PDF..."):
-                msg = rag_pipeline.process_pdf(uploaded_file)
-                st.success(msg)
+        # Process each upload once, not on every rerun while it stays in the widget
+        if uploaded_file and st.session_state.get("processed_pdf_id") != uploaded_file.file_id:
+            # Record the job before waiting: a rerun that interrupts this run resumes
+            # waiting on the same job instead of ingesting the file a second time
+            job = st.session_state.get("pdf_job")
+            if job is None or job[0] != uploaded_file.file_id or (job[1].done() and job[1].exception()):
+                st.session_state.pdf_job = job = _start_pdf_job(uploaded_file)
+            with st.status("Processing PDF...", expanded=True) as status:
+                msg = _wait_for_pdf_job(job, status)
+                status.update(label=msg, state="complete", expanded=False)
+            st.session_state.processed_pdf_id = uploaded_file.file_id
+            st.session_state.pop("pdf_job", None)
+            _kg_layout.clear()
+            _kg_png.clear()
         
         st.markdown("---")
         
         # Quick Stats
         st.header("📊 Quick Stats")
-        db = SessionLocal()
-        total_bookings = db.query(Booking).count()
-        confirmed = db.query(Booking).filter(Booking.status == "confirmed").count()
-        cancelled = db.query(Booking).filter(Booking.status == "cancelled").count()
-        total_customers = db.query(Customer).count()
-        db.close()
+        stats = sidebar_stats()
         
         col1, col2 = st.columns(2)
         with col1:
-            st.metric("Total Bookings", total_bookings)
-            st.metric("Confirmed", confirmed, delta=None)
+            st.metric("Total Bookings", stats["total"])
+            st.metric("Confirmed", stats["confirmed"], delta=None)
         with col2:
-            st.metric("Customers", total_customers)
-            st.metric("Cancelled", cancelled, delta=None)
+            st.metric("Customers", stats["customers"])
+            st.metric("Cancelled", stats["cancelled"], delta=None)
 
     # Main Title
     st.title("🤖 NeoBook AI - Intelligent Booking Assistant")
@@ -108,7 +236,9 @@ def main():
     with tab6:
         settings_interface()
 
+@st.fragment
 def chat_interface():
+    # Runs as a fragment: chat events rerun only this panel, not the whole app
     st.header("💬 Chat with Booking Assistant")
     
     # Session State
@@ -124,31 +254,16 @@ def chat_interface():
     
     if "booking_slots" not in st.session_state:
         st.session_state.booking_slots = {}
+    if "booking_in_progress" not in st.session_state:
+        st.session_state.booking_in_progress = False
     
-    # Quick Actions
+    # Quick Actions (answered in this same run, below)
+    quick_prompt = None
     with st.expander("⚡ Quick Actions", expanded=False):
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            if st.button("📅 Book Appointment", use_container_width=True):
-                st.session_state.messages.append({
-                    "role": "user", 
-                    "content": "I want to book an appointment"
-                })
-                st.rerun()
-        with col2:
-            if st.button("❓ Ask About Services", use_container_width=True):
-                st.session_state.messages.append({
-                    "role": "user", 
-                    "content": "What services do you offer?"
-                })
-                st.rerun()
-        with col3:
-            if st.button("🔍 Check Availability", use_container_width=True):
-                st.session_state.messages.append({
-                    "role": "user", 
-                    "content": "What time slots are available?"
-                })
-                st.rerun()
+        for col, (label, text) in zip(st.columns(3), QUICK_ACTIONS):
+            with col:
+                if st.button(label, use_container_width=True):
+                    quick_prompt = text
     
     # Chat Controls
     col1, col2 = st.columns([3, 1])
@@ -156,11 +271,16 @@ def chat_interface():
         st.markdown(f"**Messages:** {len(st.session_state.messages)}")
     with col2:
         if st.button("🗑️ Clear Chat"):
-            # Clear from database
-            memory_manager.clear_session(st.session_state.session_id)
+            # Drop queued writes, then clear from database behind any in-flight one
+            for future in st.session_state.get("pending_writes", []):
+                future.cancel()
+            st.session_state.pending_writes = []
+            _get_writer().submit(memory_manager.clear_session, st.session_state.session_id)
             st.session_state.messages = []
             st.session_state.booking_slots = {}
-            st.rerun()
+            st.session_state.booking_in_progress = False
+            _reset_history_summary()
+            st.rerun(scope="fragment")
     
     # Chat History
     for idx, msg in enumerate(st.session_state.messages):
@@ -179,10 +299,10 @@ def chat_interface():
             st.markdown(f"- *{suggestion}*")
     
     # Chat Input
-    if prompt := st.chat_input("Type your message here..."):
+    if prompt := st.chat_input("Type your message here...") or quick_prompt:
         # Add user message to session state and database
         st.session_state.messages.append({"role": "user", "content": prompt})
-        memory_manager.add_message(st.session_state.session_id, "user", prompt)
+        _persist_message(st.session_state.session_id, "user", prompt)
         
         with st.chat_message("user", avatar="👤"):
             st.markdown(prompt)
@@ -190,11 +310,16 @@ def chat_interface():
         with st.chat_message("assistant", avatar="🤖"):
             with st.spinner("Thinking..."):
                 response = process_message(prompt, st.session_state.session_id)
+            
+            # Booking replies are ready-made strings; RAG answers stream token by token
+            if isinstance(response, str):
                 st.markdown(response)
-                
-                # Add assistant response to session state and database
-                st.session_state.messages.append({"role": "assistant", "content": response})
-                memory_manager.add_message(st.session_state.session_id, "assistant", response)
+            else:
+                response = st.write_stream(response)
+            
+            # Add assistant response to session state and database
+            st.session_state.messages.append({"role": "assistant", "content": response})
+            _persist_message(st.session_state.session_id, "assistant", response)
     
     # Export Chat
     if len(st.session_state.messages) > 0:
@@ -207,6 +332,15 @@ def chat_interface():
             mime="text/plain"
         )
 
+CALENDAR_PAGE_SIZE = 500
+
+STATUS_BADGES = {"confirmed": "✅ confirmed", "cancelled": "❌ cancelled"}
+
+@st.cache_data
+def _bookings_csv(df):
+    return df.to_csv(index=False)
+
+@st.fragment
 def calendar_interface():
     st.header("📅 Booking Calendar")
     
@@ -221,21 +355,45 @@ def calendar_interface():
     with col3:
         search_name = st.text_input("Search by Name/Email")
     
-    # Query bookings
+    # Query bookings (all filtering happens in SQL)
     query = db.query(Booking)
     if status_filter != "All":
         query = query.filter(Booking.status == status_filter)
-    
-    bookings = query.all()
+    if booking_type_filter:
+        query = query.filter(Booking.booking_type.icontains(booking_type_filter, autoescape=True))
+    if search_name:
+        query = query.filter(or_(
+            Booking.customer_name.icontains(search_name, autoescape=True),
+            Booking.customer_email.icontains(search_name, autoescape=True)
+        ))
+    
+    # Statistics over the whole filtered set, aggregated by the database
+    total_count, confirmed_count, cancelled_count, unique_customers = query.with_entities(
+        func.count(Booking.id),
+        func.count(case((Booking.status == "confirmed", 1))),
+        func.count(case((Booking.status == "cancelled", 1))),
+        func.count(distinct(Booking.customer_email))
+    ).one()
+    
+    # Pagination
+    page_count = max(1, -(-total_count // CALENDAR_PAGE_SIZE))
+    page = 1
+    if page_count > 1:
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+    
+    bookings = query.order_by(Booking.created_at.desc())\
+        .offset((page - 1) * CALENDAR_PAGE_SIZE)\
+        .limit(CALENDAR_PAGE_SIZE)\
+        .all()
     
     # Extract data BEFORE closing session to avoid DetachedInstanceError
     booking_data = []
     for b in bookings:
         booking_data.append({
             "id": b.id,
-            "customer_name": b.customer.name,
-            "customer_email": b.customer.email,
-            "customer_phone": b.customer.phone,
+            "customer_name": b.customer_name,
+            "customer_email": b.customer_email,
+            "customer_phone": b.customer_phone,
             "booking_type": b.booking_type,
             "date": b.date,
             "time": b.time,
@@ -245,24 +403,15 @@ def calendar_interface():
     
     db.close()
     
-    # Apply filters on extracted data
-    if booking_type_filter:
-        booking_data = [b for b in booking_data if booking_type_filter.lower() in b["booking_type"].lower()]
-    if search_name:
-        booking_data = [b for b in booking_data if search_name.lower() in b["customer_name"].lower() or search_name.lower() in b["customer_email"].lower()]
-    
     # Statistics
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("📋 Total Bookings", len(booking_data))
+        st.metric("📋 Total Bookings", total_count)
     with col2:
-        confirmed_count = len([b for b in booking_data if b["status"] == "confirmed"])
         st.metric("✅ Confirmed", confirmed_count)
     with col3:
-        cancelled_count = len([b for b in booking_data if b["status"] == "cancelled"])
         st.metric("❌ Cancelled", cancelled_count)
     with col4:
-        unique_customers = len(set([b["customer_email"] for b in booking_data]))
         st.metric("👥 Unique Customers", unique_customers)
     
     st.markdown("---")
@@ -285,18 +434,16 @@ def calendar_interface():
         
         df = pd.DataFrame(data)
         
-        # Color-code status
-        def highlight_status(row):
-            if row['Status'] == 'confirmed':
-                return ['background-color: #d4edda'] * len(row)
-            elif row['Status'] == 'cancelled':
-                return ['background-color: #f8d7da'] * len(row)
-            return [''] * len(row)
-        
-        st.dataframe(df.style.apply(highlight_status, axis=1), use_container_width=True)
+        # Status badges instead of a per-row Styler
+        display_df = df.assign(Status=df["Status"].map(STATUS_BADGES).fillna(df["Status"]))
+        st.dataframe(
+            display_df,
+            use_container_width=True,
+            column_config={"Status": st.column_config.TextColumn("Status")}
+        )
         
-        # Export
-        csv = df.to_csv(index=False)
+        # Export (raw status values)
+        csv = _bookings_csv(df)
         st.download_button(
             label="📥 Export to CSV",
             data=csv,
@@ -306,18 +453,66 @@ def calendar_interface():
     else:
         st.info("No bookings found matching your filters.")
 
+@st.cache_data
+def _kg_layout(nodes, edges, layout_option):
+    """Computes node positions once per graph/layout combination."""
+    G = nx.Graph()
+    G.add_nodes_from(nodes)
+    G.add_edges_from(edges)
+    if layout_option == "Spring":
+        pos = nx.spring_layout(G, k=0.5, iterations=50, seed=42)
+    elif layout_option == "Circular":
+        pos = nx.circular_layout(G)
+    else:
+        pos = nx.random_layout(G, seed=42)
+    return {n: (float(x), float(y)) for n, (x, y) in pos.items()}
+
+@st.cache_resource
+def _pyplot():
+    """Imports matplotlib only when an image export is requested."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+@st.cache_data
+def _kg_png(nodes, edges, layout_option):
+    """Renders the graph to a 300 dpi PNG for download."""
+    plt = _pyplot()
+    G = nx.Graph()
+    G.add_nodes_from(nodes)
+    G.add_edges_from(edges)
+    pos = _kg_layout(nodes, edges, layout_option)
+    
+    fig, ax = plt.subplots(figsize=(12, 10))
+    nx.draw_networkx_nodes(G, pos, node_color='skyblue', node_size=1000, alpha=0.9, ax=ax)
+    nx.draw_networkx_edges(G, pos, edge_color='gray', alpha=0.5, ax=ax)
+    nx.draw_networkx_labels(G, pos, font_size=8, font_weight='bold', ax=ax)
+    ax.set_title("Knowledge Graph", fontsize=16, fontweight='bold')
+    ax.axis('off')
+    
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=300, bbox_inches='tight')
+    plt.close(fig)
+    return buf.getvalue()
+
+@st.fragment
 def kg_interface():
+    import plotly.graph_objects as go
+    
     st.header("🕸️ Knowledge Graph Visualization")
     
-    if rag_pipeline.kg.number_of_nodes() > 0:
+    node_count = rag_pipeline.kg_node_count()
+    if node_count > 0:
+        edge_count = rag_pipeline.kg_edge_count()
         # Statistics
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("🔵 Nodes", rag_pipeline.kg.number_of_nodes())
+            st.metric("🔵 Nodes", node_count)
         with col2:
-            st.metric("🔗 Edges", rag_pipeline.kg.number_of_edges())
+            st.metric("🔗 Edges", edge_count)
         with col3:
-            density = nx.density(rag_pipeline.kg)
+            density = 2 * edge_count / (node_count * (node_count - 1)) if node_count > 1 else 0
             st.metric("📊 Density", f"{density:.3f}")
         
         st.markdown("---")
@@ -325,81 +520,78 @@ def kg_interface():
         # Layout options
         layout_option = st.selectbox("Graph Layout", ["Spring", "Circular", "Random"])
         
-        # Visualization
-        fig, ax = plt.subplots(figsize=(12, 10))
+        # Hashable snapshot of the graph, used as the cache key
+        nodes = tuple(sorted(rag_pipeline.kg_nodes()))
+        edges = tuple(sorted(rag_pipeline.kg_edges()))
+        pos = _kg_layout(nodes, edges, layout_option)
         
-        if layout_option == "Spring":
-            pos = nx.spring_layout(rag_pipeline.kg, k=0.5, iterations=50)
-        elif layout_option == "Circular":
-            pos = nx.circular_layout(rag_pipeline.kg)
-        else:
-            pos = nx.random_layout(rag_pipeline.kg)
-        
-        # Draw
-        nx.draw_networkx_nodes(rag_pipeline.kg, pos, node_color='skyblue', node_size=1000, alpha=0.9, ax=ax)
-        nx.draw_networkx_edges(rag_pipeline.kg, pos, edge_color='gray', alpha=0.5, ax=ax)
-        nx.draw_networkx_labels(rag_pipeline.kg, pos, font_size=8, font_weight='bold', ax=ax)
+        # Visualization (WebGL scatter)
+        edge_x, edge_y = [], []
+        for u, v in edges:
+            edge_x += [pos[u][0], pos[v][0], None]
+            edge_y += [pos[u][1], pos[v][1], None]
         
-        ax.set_title("Knowledge Graph", fontsize=16, fontweight='bold')
-        ax.axis('off')
+        fig = go.Figure([
+            go.Scattergl(x=edge_x, y=edge_y, mode='lines',
+                         line=dict(color='gray', width=1), opacity=0.5, hoverinfo='skip'),
+            go.Scattergl(x=[pos[n][0] for n in nodes], y=[pos[n][1] for n in nodes],
+                         mode='markers+text', text=list(nodes), textposition='top center',
+                         marker=dict(color='skyblue', size=14, line=dict(color='white', width=1)),
+                         hoverinfo='text')
+        ])
+        fig.update_layout(title="Knowledge Graph", showlegend=False, height=700,
+                          xaxis=dict(visible=False), yaxis=dict(visible=False))
         
-        st.pyplot(fig)
+        st.plotly_chart(fig, use_container_width=True)
         
-        # Save graph
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', dpi=300, bbox_inches='tight')
-        buf.seek(0)
-        st.download_button(
-            label="📥 Download Graph Image",
-            data=buf,
-            file_name=f"knowledge_graph_{datetime.now().strftime('%Y%m%d')}.png",
-            mime="image/png"
-        )
+        # Save graph (rendered only on demand)
+        if st.button("🖼️ Generate Graph Image"):
+            with st.spinner("Rendering image..."):
+                png = _kg_png(nodes, edges, layout_option)
+            st.download_button(
+                label="📥 Download Graph Image",
+                data=png,
+                file_name=f"knowledge_graph_{datetime.now().strftime('%Y%m%d')}.png",
+                mime="image/png"
+            )
     else:
         st.info("📚 Knowledge Graph is empty. Upload a PDF to populate it.")
 
+@st.fragment
 def insights_interface():
-    st.header("📊 Booking Insights & Analytics")
+    import plotly.express as px
     
-    db = SessionLocal()
-    bookings = db.query(Booking).all()
-    db.close()
+    st.header("📊 Booking Insights & Analytics")
     
-    if not bookings:
+    # Prepare data
+    checksum = bookings_checksum()
+    if not checksum[0]:
         st.info("No booking data available yet.")
         return
     
-    # Prepare data
-    df = pd.DataFrame([{
-        "date": b.date,
-        "time": b.time,
-        "type": b.booking_type,
-        "status": b.status,
-        "created_at": b.created_at
-    } for b in bookings])
+    data = insights_data(checksum)
     
     # Booking Status Distribution
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("📊 Booking Status Distribution")
-        status_counts = df['status'].value_counts()
-        fig = px.pie(values=status_counts.values, names=status_counts.index, 
+        status_counts = data["status"]
+        fig = px.pie(values=status_counts["count"], names=status_counts["status"], 
                      title="Bookings by Status", hole=0.4)
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.subheader("📈 Booking Types")
-        type_counts = df['type'].value_counts()
-        fig = px.bar(x=type_counts.index, y=type_counts.values,
+        type_counts = data["type"]
+        fig = px.bar(x=type_counts["type"], y=type_counts["count"],
                      labels={'x': 'Booking Type', 'y': 'Count'},
                      title="Bookings by Type")
         st.plotly_chart(fig, use_container_width=True)
     
     # Timeline
     st.subheader("📅 Booking Timeline")
-    df['created_date'] = pd.to_datetime(df['created_at']).dt.date
-    timeline = df.groupby('created_date').size().reset_index(name='count')
+    timeline = data["timeline"]
     fig = px.line(timeline, x='created_date', y='count',
                   labels={'created_date': 'Date', 'count': 'Number of Bookings'},
                   title="Bookings Over Time")
@@ -407,8 +599,8 @@ def insights_interface():
     
     # Popular Time Slots
     st.subheader("⏰ Popular Time Slots")
-    time_counts = df['time'].value_counts().head(10)
-    fig = px.bar(x=time_counts.index, y=time_counts.values,
+    time_counts = data["time"]
+    fig = px.bar(x=time_counts["time"], y=time_counts["count"],
                  labels={'x': 'Time Slot', 'y': 'Bookings'},
                  title="Top 10 Most Booked Time Slots")
     st.plotly_chart(fig, use_container_width=True)
@@ -459,46 +651,83 @@ def settings_interface():
         if st.button("🗑️ Clear All Chat History", type="secondary"):
             if "messages" in st.session_state:
                 st.session_state.messages = []
+                st.session_state.booking_slots = {}
+                st.session_state.booking_in_progress = False
+                _reset_history_summary()
                 st.success("Chat history cleared!")
         
         if st.button("🔄 Reset Knowledge Graph", type="secondary"):
-            rag_pipeline.kg.clear()
+            rag_pipeline.reset_kg()
             rag_pipeline.documents = []
             rag_pipeline.vector_store = None
+            rag_pipeline.response_cache.clear()
             st.success("Knowledge Graph reset!")
 
 def process_message(user_input, session_id):
-    # Get conversation context
-    conversation_context = memory_manager.get_formatted_context(session_id, format_type='rag')
+    # Get conversation context from session state (DB writes may still be queued).
+    # Prior turns only: the current question is passed separately, and leaving it
+    # out keeps the semantic cache key stable across paraphrases of it.
+    conversation_context = memory_manager.format_messages(
+        st.session_state.messages[:-1][-HISTORY_WINDOW:],
+        format_type='rag'
+    )
     
     # Check Booking Intent
     is_booking = False
-    if "book" in user_input.lower() or st.session_state.booking_slots:
+    in_progress = st.session_state.get("booking_in_progress", False)
+    if _mentions_booking(user_input) or st.session_state.booking_slots or in_progress:
         is_booking = True
         
+    if (is_booking and not in_progress and not st.session_state.booking_slots
+            and BOOKING_REQUEST.search(user_input) and not STRUCTURED_INPUT.search(user_input)):
+        # Bare "I want to book" with nothing to extract yet: skip the LLM round-trip.
+        # Details mentioned here are still picked up later from the history window.
+        # The flag routes the next reply (e.g. just a name) to the slot extractor.
+        st.session_state.booking_in_progress = True
+        return booking_flow.get_next_step({})
+    
     if is_booking:
+        # Prefetch availability for already-known date/time while the LLM extracts slots
+        known = st.session_state.booking_slots
+        availability = None
+        if known.get('date') and known.get('time'):
+            availability = (known['date'], known['time'],
+                            background_executor.submit(check_availability, known['date'], known['time']))
+        
         # Extract slots
-        extracted = booking_flow.extract_intent_and_slots(st.session_state.messages, user_input)
+        extracted = booking_flow.extract_intent_and_slots(_windowed_history(), user_input)
         
         # Update session slots
         for k, v in extracted.items():
             if v:
                 st.session_state.booking_slots[k] = v
-                
+        
+        if in_progress and not st.session_state.booking_slots and not BOOKING_REQUEST.search(user_input):
+            # The follow-up carried no booking details (e.g. a plain question):
+            # leave booking mode and answer it normally
+            st.session_state.booking_in_progress = False
+            is_booking = False
+    
+    if is_booking:
         # Decide next step
         next_step = booking_flow.get_next_step(st.session_state.booking_slots)
         
         if next_step == "READY_TO_BOOK":
             slots = st.session_state.booking_slots
             
-            # Check Availability
-            if not check_availability(slots['date'], slots['time']):
+            # Check Availability (reuse the prefetch if date/time did not change)
+            if availability and availability[:2] == (slots['date'], slots['time']):
+                is_available = availability[2].result()
+            else:
+                is_available = check_availability(slots['date'], slots['time'])
+            if not is_available:
                 return f"❌ Sorry, the slot on **{slots['date']}** at **{slots['time']}** is already booked. Please choose another time."
             
             # Execute Booking
             res = save_booking_tool(slots['name'], slots['email'], slots['phone'], slots['booking_type'], slots['date'], slots['time'])
             
             if isinstance(res, dict) and res.get("success"):
+                invalidate_booking_caches()
                 booking_id = res["id"]
                 message = res["message"]
                 
@@ -514,19 +743,23 @@ Booking ID: {booking_id}
 - *Date:* {slots['date']}
 - *Time:* {slots['time']}"""
 
-                # Send Email
-                send_email_tool(slots['email'], "Booking Confirmation", email_body)
+                # Send Email without blocking the response on SMTP
+                send_email_in_background(slots['email'], "Booking Confirmation", email_body)
                 
                 # Reset slots
                 st.session_state.booking_slots = {}
-                return f"✅ **Booking Confirmed!**\n\nBooking ID: `{booking_id}`\n\n📧 A confirmation email has been sent to **{slots['email']}**."
+                st.session_state.booking_in_progress = False
+                return f"✅ **Booking Confirmed!**\n\nBooking ID: `{booking_id}`\n\n📧 A confirmation email is on its way to **{slots['email']}**."
             else:
                 return f"❌ Failed to save booking: {res.get('message') if isinstance(res, dict) else res}"
         else:
             return next_step
 
     # RAG / General Chat
-    return rag_pipeline.query(user_input, llm, conversation_context)
+    if user_input in QUICK_RAG_PROMPTS:
+        # Standalone quick-action question: answer context-free so the prewarmed cache applies
+        conversation_context = ""
+    return rag_pipeline.stream(user_input, llm, conversation_context)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
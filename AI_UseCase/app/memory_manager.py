@@ -1,32 +1,74 @@
-import json
+import atexit
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+import msgspec
+from sqlalchemy import select, func
 from sqlalchemy.orm import Session
 from db.models import ConversationHistory
-from db.database import SessionLocal
+from db.database import session_scope
+
+# Metadata is stored as a MessagePack blob
+_encoder = msgspec.msgpack.Encoder()
+_decoder = msgspec.msgpack.Decoder()
+
+# Upper-cased role labels for the 'rag' context format
+_ROLE_LABELS = {"user": "USER", "assistant": "ASSISTANT", "system": "SYSTEM"}
 
 
 class MemoryManager:
     """
     Manages short-term conversation memory for the AI booking assistant.
     Stores and retrieves the last N messages for context-aware conversations.
+    
+    New messages are buffered per session and written in batches; every read
+    of a session flushes its buffer first, so callers always see their writes.
+    The last max_messages of recently used sessions are also kept in an
+    in-process LRU cache that add_message/clear_session keep up to date.
     """
     
-    def __init__(self, max_messages: int = 25):
+    def __init__(
+        self, 
+        max_messages: int = 25, 
+        batch_size: int = 10,
+        cache_size: int = 1024,
+        cache_ttl: float = 300.0
+    ):
         """
         Initialize the memory manager.
         
         Args:
             max_messages: Maximum number of messages to keep per session (default: 25)
+            batch_size: Buffered messages per session that trigger a write (default: 10)
+            cache_size: Maximum number of sessions kept in the read cache (default: 1024)
+            cache_ttl: Seconds before a cached session is re-read from the database (default: 300)
         """
         self.max_messages = max_messages
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._pending: Dict[str, List[ConversationHistory]] = {}
+        # session_id -> (last max_messages message dicts, monotonic load time)
+        self._recent: "OrderedDict[str, tuple]" = OrderedDict()
+        # Bumped when a session is buffered, committed or cleared; a read only
+        # caches its rows if the version is unchanged since it started.
+        # Values come from one counter so they never repeat; sessions with no
+        # window and nothing pending are dropped and read as _version_floor.
+        self._versions: Dict[str, int] = {}
+        self._version_seq = 0
+        self._version_floor = 0
+        self._lock = threading.Lock()
+        atexit.register(self.flush_all)
     
     def add_message(
         self, 
         session_id: str, 
         role: str, 
         content: str, 
-        metadata: Optional[Dict] = None
+        metadata: Optional[Dict] = None,
+        db: Optional[Session] = None
     ) -> None:
         """
         Add a message to the conversation history.
@@ -36,27 +78,121 @@ class MemoryManager:
             role: 'user' or 'assistant'
             content: Message content
             metadata: Optional dictionary with additional context
+            db: Optional session to reuse (default: thread-scoped session)
+        """
+        message = ConversationHistory(
+            session_id=session_id,
+            role=role,
+            content=content,
+            # Stamp now, not at flush time, to keep buffered messages in order
+            timestamp=datetime.utcnow(),
+            extra_metadata=_encoder.encode(metadata) if metadata else None
+        )
+        with self._lock:
+            pending = self._pending.setdefault(session_id, [])
+            pending.append(message)
+            should_flush = len(pending) >= self.batch_size
+            
+            self._bump_version(session_id)
+            cached = self._recent.get(session_id)
+            if cached is not None:
+                window = cached[0]
+                window.append({
+                    "role": role,
+                    "content": content,
+                    "timestamp": message.timestamp,
+                    "metadata": _decoder.decode(message.extra_metadata) if metadata else None
+                })
+                del window[:-self.max_messages]
+        
+        if should_flush:
+            self.flush(session_id, db=db)
+    
+    def add_messages_bulk(
+        self,
+        session_id: str,
+        messages: List[Tuple[str, str, Optional[Dict]]],
+        db: Optional[Session] = None
+    ) -> int:
         """
-        db = SessionLocal()
-        try:
-            message = ConversationHistory(
+        Add several messages at once with a single insert, commit and cleanup.
+        
+        Args:
+            session_id: Unique identifier for the conversation session
+            messages: (role, content, metadata) tuples, oldest first
+            db: Optional session to reuse (default: thread-scoped session)
+        
+        Returns:
+            Number of messages written (including previously buffered ones)
+        """
+        rows = [
+            ConversationHistory(
                 session_id=session_id,
                 role=role,
                 content=content,
-                extra_metadata=json.dumps(metadata) if metadata else None
+                timestamp=datetime.utcnow(),
+                extra_metadata=_encoder.encode(metadata) if metadata else None
             )
-            db.add(message)
-            db.commit()
+            for role, content, metadata in messages
+        ]
+        with self._lock:
+            # Queue behind any buffered messages so ordering is preserved
+            self._pending.setdefault(session_id, []).extend(rows)
+            self._bump_version(session_id)
+            self._recent.pop(session_id, None)
+        return self.flush(session_id, db=db)
+    
+    def flush(self, session_id: str, db: Optional[Session] = None) -> int:
+        """
+        Write buffered messages for a session in one commit, then trim it.
+        
+        Args:
+            session_id: Unique identifier for the conversation session
+            db: Optional session to reuse (default: thread-scoped session)
+        
+        Returns:
+            Number of messages written
+        """
+        with self._lock:
+            pending = self._pending.pop(session_id, [])
+        if not pending:
+            return 0
+        
+        with session_scope(db) as db:
+            try:
+                db.add_all(pending)
+                db.commit()
+            except Exception:
+                # Rolling back detaches the rows; requeue them ahead of newer
+                # messages so the next flush retries instead of losing the batch
+                db.rollback()
+                with self._lock:
+                    self._pending[session_id] = pending + self._pending.get(session_id, [])
+                raise
             
-            # Auto-cleanup to maintain message limit
-            self.cleanup_old_messages(session_id, keep_last=self.max_messages)
-        finally:
-            db.close()
+            # Readers that raced this commit may have seen the old rows: make
+            # them skip caching and drop anything cached before the commit
+            with self._lock:
+                self._bump_version(session_id)
+                self._recent.pop(session_id, None)
+                self._forget_version(session_id)
+            
+            # Auto-cleanup to maintain message limit (once per batch)
+            self.cleanup_old_messages(session_id, keep_last=self.max_messages, db=db)
+        return len(pending)
+    
+    def flush_all(self) -> None:
+        """Write buffered messages for every session."""
+        with self._lock:
+            session_ids = list(self._pending)
+        for session_id in session_ids:
+            self.flush(session_id)
     
     def get_recent_messages(
         self, 
         session_id: str, 
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        db: Optional[Session] = None
     ) -> List[Dict]:
         """
         Retrieve recent messages for a session.
@@ -64,35 +200,98 @@ class MemoryManager:
         Args:
             session_id: Unique identifier for the conversation session
             limit: Maximum number of messages to retrieve (default: self.max_messages)
+            db: Optional session to reuse (default: thread-scoped session)
         
         Returns:
             List of message dictionaries with role, content, timestamp, and metadata
         """
         if limit is None:
             limit = self.max_messages
+        # Only windows up to max_messages are cached
+        cacheable = limit <= self.max_messages
+        
+        if cacheable:
+            window = self._cached_window(session_id)
+            if window is not None:
+                return [dict(m) for m in window[-limit:]] if limit > 0 else []
             
-        db = SessionLocal()
-        try:
-            messages = db.query(ConversationHistory)\
-                .filter(ConversationHistory.session_id == session_id)\
-                .order_by(ConversationHistory.timestamp.desc())\
-                .limit(limit)\
-                .all()
+        with session_scope(db) as db:
+            self.flush(session_id, db=db)
+            # Read after our own flush so its commit doesn't invalidate this read
+            with self._lock:
+                version = self._version(session_id)
+            # Plain rows of the needed columns; no ORM entities to hydrate
+            stmt = select(
+                ConversationHistory.role,
+                ConversationHistory.content,
+                ConversationHistory.timestamp,
+                ConversationHistory.extra_metadata
+            ).where(ConversationHistory.session_id == session_id)\
+                .order_by(ConversationHistory.timestamp.desc(), ConversationHistory.id.desc())\
+                .limit(self.max_messages if cacheable else limit)
+            rows = db.execute(stmt).all()
             
             # Reverse to get chronological order
-            messages = list(reversed(messages))
-            
-            return [
+            window = [
                 {
-                    "role": msg.role,
-                    "content": msg.content,
-                    "timestamp": msg.timestamp,
-                    "metadata": json.loads(msg.extra_metadata) if msg.extra_metadata else None
+                    "role": role,
+                    "content": content,
+                    "timestamp": timestamp,
+                    "metadata": _decoder.decode(extra_metadata) if extra_metadata else None
                 }
-                for msg in messages
+                for role, content, timestamp, extra_metadata in reversed(rows)
             ]
-        finally:
-            db.close()
+        
+        if cacheable:
+            self._store_window(session_id, window, version)
+            window = window[-limit:] if limit > 0 else []
+        return [dict(m) for m in window]
+    
+    def _cached_window(self, session_id: str) -> Optional[List[Dict]]:
+        """Return the cached window for a session, or None if missing/expired."""
+        with self._lock:
+            cached = self._recent.get(session_id)
+            if cached is None:
+                return None
+            if time.monotonic() - cached[1] > self.cache_ttl:
+                del self._recent[session_id]
+                self._forget_version(session_id)
+                return None
+            self._recent.move_to_end(session_id)
+            return list(cached[0])
+    
+    def _store_window(self, session_id: str, window: List[Dict], version: int) -> None:
+        """Cache a freshly read window unless the session was written meanwhile."""
+        with self._lock:
+            if self._version(session_id) != version:
+                return
+            self._recent[session_id] = ([dict(m) for m in window], time.monotonic())
+            self._recent.move_to_end(session_id)
+            while len(self._recent) > self.cache_size:
+                evicted, _ = self._recent.popitem(last=False)
+                self._forget_version(evicted)
+    
+    def _version(self, session_id: str) -> int:
+        """Current version of a session. Caller holds the lock."""
+        return self._versions.get(session_id, self._version_floor)
+    
+    def _bump_version(self, session_id: str) -> None:
+        """Give a session a fresh, never reused version. Caller holds the lock."""
+        self._version_seq += 1
+        self._versions[session_id] = self._version_seq
+    
+    def _forget_version(self, session_id: str) -> None:
+        """
+        Drop a session's version once it has no cached window or buffered
+        messages, so the map doesn't grow with every session ever seen.
+        Raising the floor keeps reads that started before this from caching.
+        Caller holds the lock.
+        """
+        if session_id in self._recent or session_id in self._pending:
+            return
+        version = self._versions.pop(session_id, None)
+        if version is not None:
+            self._version_floor = max(self._version_floor, version)
     
     def get_formatted_context(
         self, 
@@ -112,21 +311,37 @@ class MemoryManager:
             Formatted string of conversation history
         """
         messages = self.get_recent_messages(session_id, limit)
+        return self.format_messages(messages, format_type)
+    
+    def format_messages(
+        self, 
+        messages: List[Dict], 
+        format_type: str = 'rag'
+    ) -> str:
+        """
+        Format already-loaded messages as conversation context.
         
+        Args:
+            messages: Message dictionaries in chronological order
+            format_type: 'rag' for RAG prompts, 'booking' for booking flow
+                (the 'booking' format requires a 'timestamp' on each message)
+        
+        Returns:
+            Formatted string of conversation history
+        """
         if format_type == 'rag':
             # Format for RAG: Simple role-content pairs
-            formatted = []
-            for msg in messages:
-                formatted.append(f"{msg['role'].upper()}: {msg['content']}")
-            return "\n".join(formatted)
+            return "\n".join(
+                f"{_ROLE_LABELS.get(msg['role']) or msg['role'].upper()}: {msg['content']}"
+                for msg in messages
+            )
         
         elif format_type == 'booking':
             # Format for booking flow: More detailed with timestamps
-            formatted = []
-            for msg in messages:
-                time_str = msg['timestamp'].strftime("%H:%M:%S")
-                formatted.append(f"[{time_str}] {msg['role']}: {msg['content']}")
-            return "\n".join(formatted)
+            return "\n".join(
+                f"[{msg['timestamp']:%H:%M:%S}] {msg['role']}: {msg['content']}"
+                for msg in messages
+            )
         
         else:
             # Default format
@@ -157,7 +372,8 @@ class MemoryManager:
     def cleanup_old_messages(
         self, 
         session_id: str, 
-        keep_last: int = 25
+        keep_last: int = 25,
+        db: Optional[Session] = None
     ) -> int:
         """
         Remove old messages beyond the limit.
@@ -165,70 +381,73 @@ class MemoryManager:
         Args:
             session_id: Unique identifier for the conversation session
             keep_last: Number of most recent messages to keep
+            db: Optional session to reuse (default: thread-scoped session)
         
         Returns:
             Number of messages deleted
         """
-        db = SessionLocal()
-        try:
-            # Get all messages for this session, ordered by timestamp
-            all_messages = db.query(ConversationHistory)\
+        with session_scope(db) as db:
+            # Ids of everything older than the newest keep_last messages
+            stale_ids = db.query(ConversationHistory.id)\
                 .filter(ConversationHistory.session_id == session_id)\
-                .order_by(ConversationHistory.timestamp.desc())\
-                .all()
-            
-            # If we have more than keep_last, delete the oldest ones
-            if len(all_messages) > keep_last:
-                messages_to_delete = all_messages[keep_last:]
-                deleted_count = 0
-                for msg in messages_to_delete:
-                    db.delete(msg)
-                    deleted_count += 1
-                db.commit()
-                return deleted_count
+                .order_by(ConversationHistory.timestamp.desc(), ConversationHistory.id.desc())\
+                .offset(keep_last)\
+                .scalar_subquery()
             
-            return 0
-        finally:
-            db.close()
+            # Single DELETE ... WHERE id IN (subquery); a no-op when under the limit
+            deleted_count = db.query(ConversationHistory)\
+                .filter(ConversationHistory.id.in_(stale_ids))\
+                .delete(synchronize_session=False)
+            db.commit()
+            return deleted_count
     
-    def clear_session(self, session_id: str) -> int:
+    def clear_session(self, session_id: str, db: Optional[Session] = None) -> int:
         """
         Clear all messages for a session.
         
         Args:
             session_id: Unique identifier for the conversation session
+            db: Optional session to reuse (default: thread-scoped session)
         
         Returns:
             Number of messages deleted
         """
-        db = SessionLocal()
-        try:
+        with self._lock:
+            dropped = self._pending.pop(session_id, [])
+            self._recent.pop(session_id, None)
+            self._bump_version(session_id)
+        
+        with session_scope(db) as db:
             deleted_count = db.query(ConversationHistory)\
                 .filter(ConversationHistory.session_id == session_id)\
                 .delete()
             db.commit()
-            return deleted_count
-        finally:
-            db.close()
+        
+        # Reads that raced the delete may have cached the old rows
+        with self._lock:
+            self._bump_version(session_id)
+            self._recent.pop(session_id, None)
+            self._forget_version(session_id)
+        return deleted_count + len(dropped)
     
-    def get_session_count(self, session_id: str) -> int:
+    def get_session_count(self, session_id: str, db: Optional[Session] = None) -> int:
         """
         Get the number of messages in a session.
         
         Args:
             session_id: Unique identifier for the conversation session
+            db: Optional session to reuse (default: thread-scoped session)
         
         Returns:
             Number of messages in the session
         """
-        db = SessionLocal()
-        try:
-            count = db.query(ConversationHistory)\
-                .filter(ConversationHistory.session_id == session_id)\
-                .count()
-            return count
-        finally:
-            db.close()
+        with session_scope(db) as db:
+            self.flush(session_id, db=db)
+            return db.scalar(
+                select(func.count())
+                .select_from(ConversationHistory)
+                .where(ConversationHistory.session_id == session_id)
+            )
 
 
 # Singleton instance
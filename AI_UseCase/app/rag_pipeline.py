@@ -1,114 +1,247 @@
 import os
-from PyPDF2 import PdfReader
+import re
+import hashlib
+import threading
+import functools
+from collections import OrderedDict, defaultdict
+import pypdfium2 as pdfium
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings.huggingface import HuggingFaceEmbeddings
 from langchain_groq import ChatGroq
 
 from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 
-import networkx as nx
 import pickle
 
+from app.semantic_cache import SemanticCache
 
 
+# Number of retrieved contexts kept per pipeline
+RETRIEVAL_CACHE_SIZE = 256
+
+# Capitalized words of 4+ letters, used as naive KG entities
+_ENTITY_RE = re.compile(r"\b[A-Z][A-Za-z]{3,}\b")
+
+
+@functools.lru_cache(maxsize=1)
+def _get_embeddings():
+    """Loads the sentence-transformer once per process; every pipeline shares it."""
+    import torch
+    from langchain_community.embeddings.huggingface import HuggingFaceEmbeddings
+    if torch.cuda.is_available():
+        # Half precision on GPU; larger batches keep the device busy during PDF ingest
+        model_kwargs = {"device": "cuda", "model_kwargs": {"torch_dtype": torch.float16}}
+        batch_size = 128
+    else:
+        # FP16 is slower than FP32 on CPU, so keep full precision there
+        model_kwargs = {"device": "cpu"}
+        batch_size = 64
+    return HuggingFaceEmbeddings(
+        model_name="sentence-transformers/all-MiniLM-L6-v2",
+        model_kwargs=model_kwargs,
+        encode_kwargs={"batch_size": batch_size, "normalize_embeddings": True, "convert_to_numpy": True}
+    )
 
 
 class RAGPipeline:
     def __init__(self):
-        self.embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        self.embeddings = _get_embeddings()
         self.vector_store = None
-        self.kg = nx.Graph()
+        self._retriever = None
+        # (store version, query hash) -> retrieved context, least recently used first
+        self._retrieval_cache = OrderedDict()
+        self._retrieval_lock = threading.Lock()
+        self._vs_version = 0
+        # Knowledge graph as adjacency sets: entity -> chunk ids, chunk id -> preview
+        self._entity_to_chunks = defaultdict(set)
+        self._chunk_meta = {}
         self.documents = []
+        self.response_cache = SemanticCache(self.embeddings, threshold=0.95)
+        
+        # Answer prompt, parsed once; the chain is bound lazily to the caller's LLM
+        prompt_template = """
+        You are an AI Booking Assistant. Use the following context and conversation history to answer the user's question.
+        If the answer is not in the context, say you don't know, but try to be helpful.
+        
+        Conversation History:
+        {conversation_history}
+        
+        Knowledge Base Context:
+        {context}
+        
+        Current Question: {question}
         
-    def process_pdf(self, pdf_file):
-        """Reads PDF, extracts text, chunks it, and builds Vector Store + KG"""
-        pdf_reader = PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text()
+        Answer:
+        """
+        self._prompt = PromptTemplate(
+            template=prompt_template, 
+            input_variables=["conversation_history", "context", "question"]
+        )
+        self._chain = None
+        self._chain_llm = None
+        
+    def process_pdf(self, pdf_file, progress=None):
+        """Reads PDF, extracts text, chunks it, and builds Vector Store + KG
+
+        `progress`, if given, is called with a short message before each stage.
+        """
+        report = progress or (lambda message: None)
+        
+        report("Extracting text...")
+        text = self._extract_text(pdf_file)
             
         # Chunking
+        report("Splitting into chunks...")
         text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
         chunks = text_splitter.split_text(text)
         self.documents.extend(chunks)
         
         # Build Vector Store
-        if self.vector_store is None:
-            self.vector_store = FAISS.from_texts(chunks, self.embeddings)
-        else:
-            self.vector_store.add_texts(chunks)
+        report(f"Embedding {len(chunks)} chunks...")
+        if chunks:
+            # One batched encoder pass, then hand the vectors to FAISS as-is
+            text_embeddings = list(zip(chunks, self.embeddings.embed_documents(chunks)))
+            if self.vector_store is None:
+                self.vector_store = FAISS.from_embeddings(text_embeddings, self.embeddings)
+            else:
+                self.vector_store.add_embeddings(text_embeddings)
             
         # Build Knowledge Graph (Simplified)
+        report("Building knowledge graph...")
         self._build_kg(chunks)
         
+        # Cached answers and retrievals may be stale now that the knowledge base changed
+        self._vs_version += 1
+        self.response_cache.clear()
+        
         return "PDF processed successfully."
 
+    @staticmethod
+    def _extract_text(pdf_file):
+        """Extracts the text of every page with pdfium (pages joined by newlines)."""
+        # pdfium is not thread-safe, so pages are read sequentially
+        pdf = pdfium.PdfDocument(pdf_file)
+        try:
+            pages = []
+            for page in pdf:
+                textpage = page.get_textpage()
+                pages.append(textpage.get_text_range())
+                textpage.close()
+                page.close()
+            return "\n".join(pages)
+        finally:
+            pdf.close()
+
     def _build_kg(self, chunks):
         """Simple entity extraction for KG (Mock implementation for speed)"""
         # In a real scenario, use an LLM or NER model to extract entities
         # Here we just link chunks to a central node or keywords
-        for i, chunk in enumerate(chunks):
+        # Offset ids so chunks from a later upload don't overwrite earlier ones
+        start = len(self._chunk_meta)
+        for i, chunk in enumerate(chunks, start):
             node_id = f"chunk_{i}"
-            self.kg.add_node(node_id, content=chunk[:50] + "...")
+            self._chunk_meta[node_id] = chunk[:50] + "..."
             # Extract capitalized words as naive entities
-            words = [w for w in chunk.split() if w[0].isupper() and len(w) > 3]
-            for word in set(words):
-                self.kg.add_node(word, type="entity")
-                self.kg.add_edge(node_id, word)
+            for entity in _ENTITY_RE.findall(chunk):
+                self._entity_to_chunks[entity].add(node_id)
+
+    def kg_nodes(self):
+        """All chunk and entity node ids."""
+        return [*self._chunk_meta, *self._entity_to_chunks]
+
+    def kg_edges(self):
+        """(chunk id, entity) pairs."""
+        return [(c, e) for e, chunk_ids in self._entity_to_chunks.items() for c in chunk_ids]
+
+    def kg_node_count(self):
+        return len(self._chunk_meta) + len(self._entity_to_chunks)
+
+    def kg_edge_count(self):
+        return sum(len(chunk_ids) for chunk_ids in self._entity_to_chunks.values())
+
+    def reset_kg(self):
+        """Drops every node and edge of the knowledge graph."""
+        self._entity_to_chunks.clear()
+        self._chunk_meta.clear()
 
     def query(self, query, llm, conversation_context=""):
         """Hybrid Query: KG -> RAG -> LLM with conversation context"""
+        return "".join(self.stream(query, llm, conversation_context))
+
+    def stream(self, query, llm, conversation_context=""):
+        """Same as query(), but yields the answer as the LLM produces it."""
         
-        # 1. Try KG (Naive search for entities in query)
-        kg_context = []
-        query_words = query.split()
-        for word in query_words:
-            if self.kg.has_node(word):
-                neighbors = list(self.kg.neighbors(word))
-                for n in neighbors:
-                    if n.startswith("chunk_"):
-                        # In a real app, retrieve full content. 
-                        # Here we rely on Vector Store for full content.
-                        pass
-        
-        # 2. RAG Retrieval
-        if self.vector_store:
-            retriever = self.vector_store.as_retriever(search_kwargs={"k": 3})
-            docs = retriever.invoke(query)
-            context = "\n\n".join([d.page_content for d in docs])
-        else:
-            context = "No documents uploaded."
-            
-        # 3. Generate Answer with conversation context
-        prompt_template = """
-        You are an AI Booking Assistant. Use the following context and conversation history to answer the user's question.
-        If the answer is not in the context, say you don't know, but try to be helpful.
-        
-        Conversation History:
-        {conversation_history}
-        
-        Knowledge Base Context:
-        {context}
-        
-        Current Question: {question}
+        # 0. Semantic cache: skip retrieval and the LLM for repeated questions
+        cached = self.response_cache.get(query, conversation_context)
+        if cached is not None:
+            yield cached
+            return
         
-        Answer:
-        """
-        prompt = PromptTemplate(
-            template=prompt_template, 
-            input_variables=["conversation_history", "context", "question"]
-        )
-        chain = prompt | llm
+        # 1. RAG Retrieval (the KG only holds chunk previews, so it is used for
+        # visualization; full content comes from the vector store)
+        context = self._retrieve(query)
+            
+        # 2. Generate Answer with conversation context
+        chain = self._answer_chain(llm)
         
-        response = chain.invoke({
+        parts = []
+        for chunk in chain.stream({
             "conversation_history": conversation_context if conversation_context else "No previous conversation.",
             "context": context, 
             "question": query
-        })
-        return response.content
+        }):
+            parts.append(chunk)
+            yield chunk
+        self.response_cache.put(query, "".join(parts), conversation_context)
+
+    def prewarm(self, questions, llm):
+        """Answers standalone questions in one batched LLM call and caches the responses."""
+        pending = [q for q in questions if self.response_cache.get(q) is None]
+        if not pending:
+            return
+        
+        chain = self._answer_chain(llm)
+        responses = chain.batch([{
+            "conversation_history": "No previous conversation.",
+            "context": self._retrieve(q),
+            "question": q
+        } for q in pending])
+        for question, response in zip(pending, responses):
+            self.response_cache.put(question, response)
+
+    def _retrieve(self, query):
+        """Returns the top matching chunks for a query as one context string."""
+        if not self.vector_store:
+            return "No documents uploaded."
+        
+        key = (self._vs_version, hashlib.sha1(query.strip().lower().encode("utf-8")).digest())
+        with self._retrieval_lock:
+            context = self._retrieval_cache.get(key)
+            if context is not None:
+                self._retrieval_cache.move_to_end(key)
+                return context
+        
+        docs = self._get_retriever().invoke(query)
+        context = "\n\n".join([d.page_content for d in docs])
+        with self._retrieval_lock:
+            self._retrieval_cache[key] = context
+            while len(self._retrieval_cache) > RETRIEVAL_CACHE_SIZE:
+                self._retrieval_cache.popitem(last=False)
+        return context
+
+    def _get_retriever(self):
+        """Returns a retriever bound to the current vector store, built once per store."""
+        if self._retriever is None or self._retriever.vectorstore is not self.vector_store:
+            self._retriever = self.vector_store.as_retriever(search_kwargs={"k": 3})
+        return self._retriever
+
+    def _answer_chain(self, llm):
+        """Returns prompt | llm | StrOutputParser, assembled once per LLM instance."""
+        if self._chain is None or self._chain_llm is not llm:
+            self._chain = self._prompt | llm | StrOutputParser()
+            self._chain_llm = llm
+        return self._chain
 
 # Singleton instance
 rag_pipeline = RAGPipeline()
@@ -0,0 +1,115 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    In-memory semantic cache for LLM responses.
+    A lookup hits when a previously answered question has the same
+    conversation context and a cosine similarity above the threshold.
+    """
+
+    def __init__(self, embeddings, threshold: float = 0.95, max_entries: int = 256):
+        """
+        Initialize the semantic cache.
+
+        Args:
+            embeddings: LangChain embeddings object used to embed questions
+            threshold: Minimum cosine similarity for a cache hit (default: 0.95)
+            max_entries: Maximum number of cached responses (default: 256)
+        """
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        # context hash -> OrderedDict[question, (unit vector, response)];
+        # buckets and entries are both kept least recently used first
+        self._entries: "OrderedDict[str, OrderedDict]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _context_key(context: str) -> str:
+        return hashlib.sha1((context or "").encode("utf-8")).hexdigest()
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, question: str, context: str = "") -> Optional[str]:
+        """
+        Look up a cached response for a semantically similar question.
+
+        Args:
+            question: User question
+            context: Conversation context the answer depended on
+
+        Returns:
+            Cached response string, or None on a miss
+        """
+        key = self._context_key(context)
+        with self._lock:
+            bucket = self._entries.get(key)
+            if not bucket:
+                return None
+            if question in bucket:
+                self._touch(key, question)
+                return bucket[question][1]
+            items = list(bucket.items())
+
+        vector = self._embed(question)
+        matrix = np.stack([v for _, (v, _) in items])
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        matched, (_, response) = items[best]
+        with self._lock:
+            # May have been evicted while embedding; only refresh if still cached
+            if matched in self._entries.get(key, ()):
+                self._touch(key, matched)
+        return response
+
+    def put(self, question: str, response: str, context: str = "") -> None:
+        """
+        Store a response for a question.
+
+        Args:
+            question: User question
+            response: LLM response to cache
+            context: Conversation context the answer depended on
+        """
+        vector = self._embed(question)
+        with self._lock:
+            key = self._context_key(context)
+            bucket = self._entries.setdefault(key, OrderedDict())
+            if question not in bucket:
+                self._size += 1
+            bucket[question] = (vector, response)
+            self._touch(key, question)
+            self._evict()
+
+    def _touch(self, key: str, question: str) -> None:
+        """Mark an entry and its context bucket as most recently used. Caller holds the lock."""
+        self._entries.move_to_end(key)
+        self._entries[key].move_to_end(question)
+
+    def _evict(self) -> None:
+        while self._size > self.max_entries:
+            # Drop the oldest entry of the least recently used context
+            key = next(iter(self._entries))
+            bucket = self._entries[key]
+            bucket.popitem(last=False)
+            self._size -= 1
+            if not bucket:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """Drop every cached response (e.g. when the knowledge base changes)."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
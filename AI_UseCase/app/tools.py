@@ -1,73 +1,89 @@
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 from db.models import Booking, Customer
-from db.database import SessionLocal
+from db.database import session_scope
+import atexit
 import smtplib
+import threading
 from email.mime.text import MIMEText
+from concurrent.futures import ThreadPoolExecutor
 
 import uuid
 
-def save_booking_tool(name, email, phone, booking_type, date, time, extra_info=""):
+# Shared worker pool for I/O that should not block the chat response
+background_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="booking-bg")
+
+# Authenticated SMTP connection reused across emails, keyed by (server, port, sender)
+_smtp_lock = threading.Lock()
+_smtp_client = None
+_smtp_key = None
+
+def save_booking_tool(name, email, phone, booking_type, date, time, extra_info="", db: Session = None):
     """Saves a booking to the database."""
-    db: Session = SessionLocal()
-    try:
-        # Check if customer exists
-        customer = db.query(Customer).filter(Customer.email == email).first()
-        if not customer:
-            customer = Customer(name=name, email=email, phone=phone)
-            db.add(customer)
+    with session_scope(db) as db:
+        try:
+            # Insert the customer unless the email is already known (unique on email)
+            customer_id = db.execute(
+                sqlite_insert(Customer)
+                .values(name=name, email=email, phone=phone)
+                .on_conflict_do_nothing(index_elements=["email"])
+                .returning(Customer.customer_id)
+            ).scalar()
+            if customer_id is None:
+                # Existing customer: the booking snapshots their stored details
+                customer_id, name, email, phone = db.execute(
+                    select(Customer.customer_id, Customer.name, Customer.email, Customer.phone)
+                    .where(Customer.email == email)
+                ).one()
+            
+            # Create booking
+            booking_id = str(uuid.uuid4())
+            booking = Booking(
+                id=booking_id,
+                customer_id=customer_id,
+                customer_name=name,
+                customer_email=email,
+                customer_phone=phone,
+                booking_type=booking_type,
+                date=date,
+                time=time,
+                extra_info=extra_info,
+                status="confirmed"
+            )
+            db.add(booking)
+            # Customer and booking land in one transaction
             db.commit()
-            db.refresh(customer)
-        
-        # Create booking
-        booking_id = str(uuid.uuid4())
-        booking = Booking(
-            id=booking_id,
-            customer_id=customer.customer_id,
-            booking_type=booking_type,
-            date=date,
-            time=time,
-            extra_info=extra_info,
-            status="confirmed"
-        )
-        db.add(booking)
-        db.commit()
-        db.refresh(booking)
-        return {"success": True, "id": booking.id, "message": f"Booking saved successfully! Booking ID: {booking.id}"}
-    except Exception as e:
-        db.rollback()
-        return {"success": False, "message": f"Error saving booking: {str(e)}"}
-    finally:
-        db.close()
+            return {"success": True, "id": booking_id, "message": f"Booking saved successfully! Booking ID: {booking_id}"}
+        except Exception as e:
+            db.rollback()
+            return {"success": False, "message": f"Error saving booking: {str(e)}"}
 
-def check_availability(date, time):
+def check_availability(date, time, db: Session = None):
     """Checks if a slot is already booked."""
-    db: Session = SessionLocal()
-    try:
+    with session_scope(db) as db:
         existing = db.query(Booking).filter(
             Booking.date == date,
             Booking.time == time,
             Booking.status == "confirmed"
         ).first()
         return existing is None
-    finally:
-        db.close()
 
-def cancel_booking_tool(booking_id):
+def cancel_booking_tool(booking_id, db: Session = None):
     """Cancels a booking by ID."""
-    db: Session = SessionLocal()
-    try:
-        booking = db.query(Booking).filter(Booking.id == booking_id).first()
-        if not booking:
-            return "Booking not found."
-        
-        booking.status = "cancelled"
-        db.commit()
-        return f"Booking {booking_id} cancelled successfully."
-    except Exception as e:
-        db.rollback()
-        return f"Error cancelling booking: {str(e)}"
-    finally:
-        db.close()
+    with session_scope(db) as db:
+        try:
+            # Primary-key lookup (served from the identity map when already loaded)
+            booking = db.get(Booking, booking_id.strip())
+            if not booking:
+                return "Booking not found."
+            
+            booking.status = "cancelled"
+            db.commit()
+            return f"Booking {booking_id} cancelled successfully."
+        except Exception as e:
+            db.rollback()
+            return f"Error cancelling booking: {str(e)}"
 
 def send_email_tool(to_email, subject, body):
     """Sends an email using SMTP if credentials are provided, otherwise mocks it."""
@@ -92,11 +108,55 @@ def send_email_tool(to_email, subject, body):
         msg['From'] = sender_email
         msg['To'] = to_email
 
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
+        with _smtp_lock:
+            server = _get_smtp_client(smtp_server, smtp_port, sender_email, sender_password)
+            try:
+                server.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                # Dropped between the NOOP check and the send; reconnect once
+                _close_smtp_client()
+                server = _get_smtp_client(smtp_server, smtp_port, sender_email, sender_password)
+                server.send_message(msg)
         return "Email sent successfully."
     except Exception as e:
+        with _smtp_lock:
+            _close_smtp_client()
         print(f"Error sending email: {e}")
         return f"Failed to send email: {str(e)}"
+
+
+def _get_smtp_client(smtp_server, smtp_port, sender_email, sender_password):
+    """Returns the cached SMTP client, reconnecting if it is stale. Caller holds _smtp_lock."""
+    global _smtp_client, _smtp_key
+    key = (smtp_server, smtp_port, sender_email)
+    if _smtp_client is not None and _smtp_key == key:
+        try:
+            if _smtp_client.noop()[0] == 250:
+                return _smtp_client
+        except (smtplib.SMTPException, OSError):
+            pass
+    _close_smtp_client()
+    server = smtplib.SMTP(smtp_server, smtp_port)
+    server.starttls()
+    server.login(sender_email, sender_password)
+    _smtp_client, _smtp_key = server, key
+    return server
+
+
+def _close_smtp_client():
+    """Drops the cached SMTP client. Caller holds _smtp_lock (or is exiting)."""
+    global _smtp_client, _smtp_key
+    if _smtp_client is not None:
+        try:
+            _smtp_client.quit()
+        except Exception:
+            pass
+    _smtp_client, _smtp_key = None, None
+
+
+atexit.register(_close_smtp_client)
+
+
+def send_email_in_background(to_email, subject, body):
+    """Queues send_email_tool on the background pool and returns its Future."""
+    return background_executor.submit(send_email_tool, to_email, subject, body)
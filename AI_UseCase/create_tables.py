@@ -14,9 +14,11 @@ load_dotenv()
 
 from db.database import Base, engine
 from db.models import Customer, Booking, ConversationHistory
+from db import migrations
 
 print("Creating/updating database tables...")
 Base.metadata.create_all(bind=engine)
+migrations.upgrade(engine)
 print("✅ All tables created successfully!")
 
 # Verify tables
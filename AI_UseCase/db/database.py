@@ -1,5 +1,6 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base
 import os
 
 if not os.path.exists('data'):
@@ -8,14 +9,59 @@ if not os.path.exists('data'):
 SQLALCHEMY_DATABASE_URL = "sqlite:///./data/booking_assistant_v2.db"
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=10,
+    max_overflow=20
 )
 
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL journaling and cheaper fsyncs for every pooled connection."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-65536")  # 64 MiB
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+    cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# One session per thread, reused by every helper called within a session_scope
+ScopedSession = scoped_session(SessionLocal)
+
 Base = declarative_base()
 
 
+@contextmanager
+def session_scope(db=None):
+    """
+    Provide a transactional scope around a series of operations.
+
+    Yields `db` unchanged when the caller already has a session. Otherwise
+    yields the thread-scoped session; the outermost scope commits on success,
+    rolls back on error and releases the session. Nested scopes share it.
+    """
+    if db is not None:
+        yield db
+        return
+
+    if ScopedSession.registry.has():
+        yield ScopedSession()
+        return
+
+    session = ScopedSession()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        ScopedSession.remove()
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -0,0 +1,69 @@
+"""
+Lightweight, idempotent schema upgrades for existing SQLite databases.
+`Base.metadata.create_all` only creates missing tables, so columns added
+to existing models and changes to stored formats are applied here.
+"""
+
+import json
+
+import msgspec
+from sqlalchemy import inspect, text
+
+# bookings column -> customers column it snapshots
+BOOKING_CUSTOMER_COLUMNS = {
+    "customer_name": "name",
+    "customer_email": "email",
+    "customer_phone": "phone",
+}
+
+
+def upgrade(engine):
+    """Applies every upgrade step; safe to run on each start."""
+    inspector = inspect(engine)
+    tables = inspector.get_table_names()
+    if "bookings" in tables:
+        _add_booking_customer_columns(engine, inspector)
+    if "conversation_history" in tables:
+        _convert_metadata_to_msgpack(engine)
+        _add_session_timestamp_index(engine)
+
+
+def _add_booking_customer_columns(engine, inspector):
+    """Adds the customer snapshot columns to bookings and backfills them."""
+    existing = {c["name"] for c in inspector.get_columns("bookings")}
+    with engine.begin() as conn:
+        for column, source in BOOKING_CUSTOMER_COLUMNS.items():
+            if column in existing:
+                continue
+            conn.execute(text(f"ALTER TABLE bookings ADD COLUMN {column} VARCHAR"))
+            conn.execute(text(
+                f"UPDATE bookings SET {column} = "
+                f"(SELECT customers.{source} FROM customers "
+                f"WHERE customers.customer_id = bookings.customer_id)"
+            ))
+
+
+def _convert_metadata_to_msgpack(engine):
+    """Re-encodes conversation metadata stored as JSON text into MessagePack blobs."""
+    encoder = msgspec.msgpack.Encoder()
+    with engine.begin() as conn:
+        rows = conn.execute(text(
+            "SELECT id, extra_metadata FROM conversation_history "
+            "WHERE typeof(extra_metadata) = 'text'"
+        )).all()
+        for row_id, value in rows:
+            conn.execute(
+                text("UPDATE conversation_history SET extra_metadata = :value WHERE id = :id"),
+                {"value": encoder.encode(json.loads(value)), "id": row_id}
+            )
+
+
+def _add_session_timestamp_index(engine):
+    """Replaces the standalone session_id/timestamp indexes with (session_id, timestamp)."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_conv_session_ts "
+            "ON conversation_history (session_id, timestamp)"
+        ))
+        conn.execute(text("DROP INDEX IF EXISTS ix_conversation_history_timestamp"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_conversation_history_session_id"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, LargeBinary, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -20,6 +20,10 @@ class Booking(Base):
 
     id = Column(String, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("customers.customer_id"))
+    # Snapshot of the customer at booking time, so read paths need no join
+    customer_name = Column(String, nullable=True)
+    customer_email = Column(String, nullable=True)
+    customer_phone = Column(String, nullable=True)
     booking_type = Column(String)
     date = Column(String)
     time = Column(String)
@@ -32,10 +36,12 @@ class Booking(Base):
 
 class ConversationHistory(Base):
     __tablename__ = "conversation_history"
+    # Serves "latest N messages of a session" without a filesort
+    __table_args__ = (Index("ix_conv_session_ts", "session_id", "timestamp"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(String, index=True)
+    session_id = Column(String)  # indexed as the leading column of ix_conv_session_ts
     role = Column(String)
     content = Column(Text)
-    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
-    extra_metadata = Column(Text, nullable=True)
+    timestamp = Column(DateTime, default=datetime.utcnow)
+    extra_metadata = Column(LargeBinary, nullable=True)  # MessagePack
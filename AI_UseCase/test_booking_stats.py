@@ -0,0 +1,71 @@
+"""
+Test script for the cached booking aggregates.
+Runs the Streamlit-cached helpers outside a Streamlit server.
+"""
+
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.booking_stats import bookings_checksum, insights_data, invalidate_booking_caches
+from app.tools import save_booking_tool
+from db.database import Base, engine, SessionLocal
+from db.models import Booking
+from db import migrations
+import uuid
+
+# Initialize database
+Base.metadata.create_all(bind=engine)
+migrations.upgrade(engine)
+
+def test_insights_data_with_bookings():
+    """Insights aggregates can be computed and cached once bookings exist"""
+    print("=" * 60)
+    print("TEST 1: Insights Data")
+    print("=" * 60)
+
+    email = f"{uuid.uuid4().hex}@example.com"
+    print("\n1. Saving a booking...")
+    res = save_booking_tool("Stats Test", email, "5550100", "Consultation", "2030-01-01", "10:00")
+    assert res["success"], res["message"]
+
+    try:
+        invalidate_booking_caches()
+        checksum = bookings_checksum()
+        print(f"   Checksum: {checksum}")
+        assert isinstance(checksum, tuple), "Checksum must be a plain, hashable tuple"
+        assert checksum[0] >= 1, "Checksum should count the new booking"
+
+        # Used as the st.cache_data key; an unhashable key raises here
+        data = insights_data(checksum)
+        assert not data["status"].empty, "Status counts should not be empty"
+        assert set(data) == {"status", "type", "timeline", "time"}
+        print("   ✓ insights_data(bookings_checksum()) works")
+    finally:
+        db = SessionLocal()
+        try:
+            db.query(Booking).filter(Booking.id == res["id"]).delete()
+            db.commit()
+        finally:
+            db.close()
+        invalidate_booking_caches()
+
+    print("\n✅ Test 1 PASSED\n")
+
+if __name__ == "__main__":
+    print("\n" + "=" * 60)
+    print("BOOKING STATS TEST SUITE")
+    print("=" * 60 + "\n")
+
+    try:
+        test_insights_data_with_bookings()
+
+        print("=" * 60)
+        print("🎉 ALL TESTS PASSED!")
+        print("=" * 60 + "\n")
+
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}\n")
+        sys.exit(1)
@@ -9,8 +9,11 @@ import os
 # Add project root to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.memory_manager import memory_manager
-from db.database import Base, engine
+from app.memory_manager import memory_manager, MemoryManager
+from db.database import Base, engine, SessionLocal
+from db.models import ConversationHistory
+from sqlalchemy.orm import Session
+import time
 import uuid
 
 # Initialize database
@@ -53,8 +56,9 @@ def test_message_limit():
     
     # Add 30 messages
     print("\n1. Adding 30 messages...")
-    for i in range(30):
-        memory_manager.add_message(session_id, "user" if i % 2 == 0 else "assistant", f"Message {i+1}")
+    memory_manager.add_messages_bulk(session_id, [
+        ("user" if i % 2 == 0 else "assistant", f"Message {i+1}", None) for i in range(30)
+    ])
     
     # Check count
     count = memory_manager.get_session_count(session_id)
@@ -195,6 +199,217 @@ def test_messages_as_list():
     
     print("\n✅ Test 6 PASSED\n")
 
+def _stored_count(session_id):
+    """Rows actually committed for a session, bypassing the write buffer."""
+    db = SessionLocal()
+    try:
+        return db.query(ConversationHistory).filter(ConversationHistory.session_id == session_id).count()
+    finally:
+        db.close()
+
+def test_batch_flush():
+    """Test that buffered messages are written once batch_size is reached"""
+    print("=" * 60)
+    print("TEST 7: Batch Flush")
+    print("=" * 60)
+    
+    manager = MemoryManager(batch_size=3)
+    session_id = str(uuid.uuid4())
+    
+    print("\n1. Adding 2 messages (below batch size)...")
+    manager.add_message(session_id, "user", "Message 1")
+    manager.add_message(session_id, "assistant", "Message 2")
+    assert _stored_count(session_id) == 0, "Messages below batch size should stay buffered"
+    print("   ✓ Messages buffered")
+    
+    print("\n2. Adding the 3rd message...")
+    manager.add_message(session_id, "user", "Message 3")
+    assert _stored_count(session_id) == 3, "Reaching batch size should write the batch"
+    assert session_id not in manager._pending, "Buffer should be empty after the flush"
+    print("   ✓ Batch written in one flush")
+    
+    manager.clear_session(session_id)
+    print("\n✅ Test 7 PASSED\n")
+
+def test_buffered_reads():
+    """Test that reads see messages still in the write buffer"""
+    print("=" * 60)
+    print("TEST 8: Reads See Buffered Messages")
+    print("=" * 60)
+    
+    manager = MemoryManager(batch_size=10)
+    session_id = str(uuid.uuid4())
+    
+    manager.add_message(session_id, "user", "Message 1")
+    manager.add_message(session_id, "assistant", "Message 2")
+    assert _stored_count(session_id) == 0, "Messages should still be buffered"
+    
+    messages = manager.get_recent_messages(session_id)
+    assert [m["content"] for m in messages] == ["Message 1", "Message 2"], "Read should include buffered messages"
+    print("   ✓ get_recent_messages sees buffered messages")
+    
+    manager.add_message(session_id, "user", "Message 3")
+    assert manager.get_session_count(session_id) == 3, "Count should include buffered messages"
+    print("   ✓ get_session_count sees buffered messages")
+    
+    manager.clear_session(session_id)
+    print("\n✅ Test 8 PASSED\n")
+
+def test_failed_flush_requeues():
+    """Test that a failed commit puts the batch back ahead of newer messages"""
+    print("=" * 60)
+    print("TEST 9: Failed Flush Requeues")
+    print("=" * 60)
+    
+    manager = MemoryManager(batch_size=10)
+    session_id = str(uuid.uuid4())
+    manager.add_message(session_id, "user", "Message 1")
+    manager.add_message(session_id, "assistant", "Message 2")
+    
+    # Make the next commit fail once, as "database is locked" would
+    original_commit = Session.commit
+    failed = []
+    def failing_commit(self):
+        if not failed:
+            failed.append(True)
+            raise RuntimeError("database is locked")
+        return original_commit(self)
+    
+    print("\n1. Flushing with a failing commit...")
+    Session.commit = failing_commit
+    try:
+        manager.flush(session_id)
+        assert False, "Flush should re-raise the commit error"
+    except RuntimeError:
+        pass
+    finally:
+        Session.commit = original_commit
+    
+    manager.add_message(session_id, "user", "Message 3")
+    pending = [m.content for m in manager._pending[session_id]]
+    assert pending == ["Message 1", "Message 2", "Message 3"], f"Batch should be requeued in order, got {pending}"
+    print("   ✓ Failed batch requeued ahead of newer messages")
+    
+    print("\n2. Retrying the flush...")
+    manager.flush(session_id)
+    messages = manager.get_recent_messages(session_id)
+    assert [m["content"] for m in messages] == ["Message 1", "Message 2", "Message 3"], "Retry should write every message"
+    print("   ✓ Retry wrote the whole batch")
+    
+    manager.clear_session(session_id)
+    print("\n✅ Test 9 PASSED\n")
+
+def test_clear_session_drops_buffered():
+    """Test that clearing a session also drops messages not yet written"""
+    print("=" * 60)
+    print("TEST 10: Clear Drops Buffered Messages")
+    print("=" * 60)
+    
+    manager = MemoryManager(batch_size=3)
+    session_id = str(uuid.uuid4())
+    for i in range(4):
+        manager.add_message(session_id, "user", f"Message {i+1}")  # 3 written, 1 buffered
+    
+    deleted = manager.clear_session(session_id)
+    print(f"   Deleted {deleted} messages")
+    assert deleted == 4, "Should count written and buffered messages"
+    assert session_id not in manager._pending, "Buffer should be dropped"
+    
+    manager.flush(session_id)
+    assert _stored_count(session_id) == 0, "Dropped messages must not be written later"
+    print("   ✓ Buffered messages dropped")
+    
+    print("\n✅ Test 10 PASSED\n")
+
+def test_cache_hit_after_add():
+    """Test that a cached window picks up new messages without a database read"""
+    print("=" * 60)
+    print("TEST 11: Cache Hit After Add")
+    print("=" * 60)
+    
+    manager = MemoryManager(batch_size=10)
+    session_id = str(uuid.uuid4())
+    manager.add_message(session_id, "user", "Message 1")
+    manager.get_recent_messages(session_id)  # miss: flushes and caches the window
+    
+    manager.add_message(session_id, "assistant", "Message 2")
+    messages = manager.get_recent_messages(session_id)
+    assert [m["content"] for m in messages] == ["Message 1", "Message 2"], "Cached window should include the new message"
+    # A miss would have flushed the buffer before reading
+    assert len(manager._pending.get(session_id, [])) == 1, "Read should be served from the cache"
+    print("   ✓ Served from cache, including the buffered message")
+    
+    manager.clear_session(session_id)
+    print("\n✅ Test 11 PASSED\n")
+
+def test_cache_cleared_with_session():
+    """Test that clearing a session evicts its cached window and version"""
+    print("=" * 60)
+    print("TEST 12: Cache Eviction on Clear")
+    print("=" * 60)
+    
+    manager = MemoryManager(batch_size=10)
+    session_id = str(uuid.uuid4())
+    manager.add_message(session_id, "user", "Message 1")
+    manager.get_recent_messages(session_id)
+    assert session_id in manager._recent, "Window should be cached"
+    
+    manager.clear_session(session_id)
+    assert session_id not in manager._recent, "Window should be evicted"
+    assert session_id not in manager._versions, "Version should be dropped"
+    assert manager.get_recent_messages(session_id) == [], "Cleared session should read empty"
+    print("   ✓ Cleared session evicted from the cache")
+    
+    print("\n✅ Test 12 PASSED\n")
+
+def test_cache_ttl():
+    """Test that a cached window expires after cache_ttl seconds"""
+    print("=" * 60)
+    print("TEST 13: Cache TTL")
+    print("=" * 60)
+    
+    manager = MemoryManager(batch_size=10, cache_ttl=0.05)
+    session_id = str(uuid.uuid4())
+    manager.add_message(session_id, "user", "Message 1")
+    manager.get_recent_messages(session_id)
+    
+    time.sleep(0.1)
+    assert manager._cached_window(session_id) is None, "Window should have expired"
+    assert session_id not in manager._versions, "Expired session should drop its version"
+    assert len(manager.get_recent_messages(session_id)) == 1, "Expired window should be re-read"
+    print("   ✓ Expired window re-read from the database")
+    
+    manager.clear_session(session_id)
+    print("\n✅ Test 13 PASSED\n")
+
+def test_cache_size_cap():
+    """Test that at most cache_size sessions are cached, least recently used evicted"""
+    print("=" * 60)
+    print("TEST 14: Cache Size Cap")
+    print("=" * 60)
+    
+    manager = MemoryManager(batch_size=10, cache_size=2)
+    session_ids = [str(uuid.uuid4()) for _ in range(3)]
+    for session_id in session_ids:
+        manager.add_message(session_id, "user", "Hello")
+        manager.get_recent_messages(session_id)
+    
+    assert list(manager._recent) == session_ids[1:], "Oldest session should be evicted"
+    assert session_ids[0] not in manager._versions, "Evicted session should drop its version"
+    assert len(manager._versions) <= 2, "Versions should not outgrow the cache"
+    print("   ✓ Cache capped and versions pruned")
+    
+    for session_id in session_ids:
+        manager.clear_session(session_id)
+    assert not manager._versions, "Cleared sessions should leave no versions behind"
+    print("\n✅ Test 14 PASSED\n")
+
+def test_bench_add(benchmark):
+    """Benchmark add_message (run with: pytest test_memory.py --benchmark-only)"""
+    session_id = str(uuid.uuid4())
+    benchmark(memory_manager.add_message, session_id, "user", "x")
+    memory_manager.clear_session(session_id)
+
 if __name__ == "__main__":
     print("\n" + "=" * 60)
     print("MEMORY MANAGER TEST SUITE")
@@ -207,6 +422,14 @@ if __name__ == "__main__":
         test_session_isolation()
         test_clear_session()
         test_messages_as_list()
+        test_batch_flush()
+        test_buffered_reads()
+        test_failed_flush_requeues()
+        test_clear_session_drops_buffered()
+        test_cache_hit_after_add()
+        test_cache_cleared_with_session()
+        test_cache_ttl()
+        test_cache_size_cap()
         
         print("=" * 60)
         print("🎉 ALL TESTS PASSED!")
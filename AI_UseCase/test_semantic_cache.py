@@ -0,0 +1,133 @@
+"""
+Test script for the semantic response cache.
+Uses a bag-of-words embedding so no model download is needed.
+"""
+
+import sys
+import os
+import re
+from collections import Counter
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.semantic_cache import SemanticCache
+from app.memory_manager import memory_manager
+
+VOCAB = ["what", "are", "your", "opening", "hours", "when", "do", "you", "open", "price", "room"]
+
+
+class BagOfWordsEmbeddings:
+    """Counts vocabulary words; word order and punctuation are ignored."""
+
+    def embed_query(self, text):
+        counts = Counter(re.findall(r"[a-z]+", text.lower()))
+        return [float(counts[w]) for w in VOCAB]
+
+
+def _chat_context(messages):
+    """Context the chat builds for a turn: prior turns only, as in process_message."""
+    return memory_manager.format_messages(messages[:-1][-8:], format_type='rag')
+
+
+def test_paraphrase_hits():
+    """A reworded question with the same prior turns is served from the cache"""
+    print("=" * 60)
+    print("TEST 1: Paraphrase Hit")
+    print("=" * 60)
+
+    cache = SemanticCache(BagOfWordsEmbeddings(), threshold=0.95)
+    history = [
+        {"role": "user", "content": "Hi"},
+        {"role": "assistant", "content": "Hello! How can I help?"},
+    ]
+
+    first = history + [{"role": "user", "content": "What are your opening hours?"}]
+    cache.put(first[-1]["content"], "9 AM to 6 PM.", _chat_context(first))
+
+    # Same prior turns (e.g. another session), question reworded
+    second = history + [{"role": "user", "content": "Your opening hours are what?"}]
+    hit = cache.get(second[-1]["content"], _chat_context(second))
+    print(f"   Cached answer: {hit}")
+    assert hit == "9 AM to 6 PM.", "Paraphrase should hit the cache"
+    print("   ✓ Paraphrase served from cache")
+
+    print("\n✅ Test 1 PASSED\n")
+
+
+def test_context_isolation():
+    """A different conversation history does not reuse the answer"""
+    print("=" * 60)
+    print("TEST 2: Context Isolation")
+    print("=" * 60)
+
+    cache = SemanticCache(BagOfWordsEmbeddings(), threshold=0.95)
+    cache.put("What are your opening hours?", "9 AM to 6 PM.", context="")
+
+    miss = cache.get("What are your opening hours?", context="USER: Tell me the room price")
+    assert miss is None, "Different history should miss"
+    print("   ✓ Other conversation context misses")
+
+    print("\n✅ Test 2 PASSED\n")
+
+
+def test_unrelated_question_misses():
+    """A dissimilar question below the threshold misses"""
+    print("=" * 60)
+    print("TEST 3: Unrelated Question")
+    print("=" * 60)
+
+    cache = SemanticCache(BagOfWordsEmbeddings(), threshold=0.95)
+    cache.put("What are your opening hours?", "9 AM to 6 PM.")
+
+    assert cache.get("What is the room price?") is None, "Unrelated question should miss"
+    print("   ✓ Unrelated question misses")
+
+    print("\n✅ Test 3 PASSED\n")
+
+
+def test_eviction_order():
+    """Eviction drops the least recently used context and entry, not the oldest created"""
+    print("=" * 60)
+    print("TEST 4: Eviction Order")
+    print("=" * 60)
+
+    cache = SemanticCache(BagOfWordsEmbeddings(), threshold=0.95, max_entries=4)
+    cache.put("What are your opening hours?", "9 AM to 6 PM.", context="")
+    cache.put("What is the room price?", "$100.", context="")
+    cache.put("When do you open?", "At 9 AM.", context="USER: Hi")
+    cache.put("Room price?", "$100.", context="USER: Hi")
+
+    # Semantic hit refreshes both the "" context and the matched entry
+    assert cache.get("Your opening hours are what?", context="") == "9 AM to 6 PM."
+
+    print("\n1. Adding 3 entries in a new context...")
+    for i in range(3):
+        cache.put(f"Question {i}", f"Answer {i}", context="USER: Hello")
+
+    assert cache.get("When do you open?", context="USER: Hi") is None, "Stale context should go first"
+    assert cache.get("What is the room price?", context="") is None, "Unused entry should go next"
+    assert cache.get("What are your opening hours?", context="") == "9 AM to 6 PM.", "Hit entry should survive"
+    print("   ✓ Recently hit entry kept, least recently used evicted")
+
+    print("\n✅ Test 4 PASSED\n")
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 60)
+    print("SEMANTIC CACHE TEST SUITE")
+    print("=" * 60 + "\n")
+
+    try:
+        test_paraphrase_hits()
+        test_context_isolation()
+        test_unrelated_question_misses()
+        test_eviction_order()
+
+        print("=" * 60)
+        print("🎉 ALL TESTS PASSED!")
+        print("=" * 60 + "\n")
+
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}\n")
+        sys.exit(1)